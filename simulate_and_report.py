@@ -1,43 +1,75 @@
 import json
 import datetime as dt
+import functools
+import time
+import warnings
+import numpy as np
 import pandas as pd
-import yfinance as yf
-import plotly.express as px
 from pathlib import Path
 
+try:
+    import orjson  # 有裝就用，解析較快
+except ImportError:
+    orjson = None
+
 OUT_DIR = Path("docs")
 OUT_DIR.mkdir(exist_ok=True)
+CACHE_DIR = Path("cache")
+CACHE_TTL_SEC = 3600  # 快取檔在這段時間內視為最新，不再補抓
+CACHE_OVERLAP_ROWS = 5  # 補抓時與快取重疊的交易日數，用來偵測還原價改寫
 
 # ===== 你要的起始日（只看 2026/01/01 以後）=====
 START = "2026-01-01"
 
-# yfinance 的 end 是「不包含」當天，所以用「明天」避免抓不到今天/最近交易日
-END = (dt.date.today() + dt.timedelta(days=1)).isoformat()
-
 MONTHLY_TWD = 10000.0
 TRADE_MODE = "month_start"  # 月初：每月第一個交易日
 
+# 模擬結果的欄位（也是 data.csv 的欄位順序）
+SIM_COLS = [
+    "date", "fx_twd_per_usd_mid", "qqq_price_usd", "twd_contribution",
+    "fx_oneway_spread", "commission_usd", "usd_after_fx_and_fee",
+    "shares_bought", "total_shares", "portfolio_value_twd"
+]
+
+# 最近 N 筆表格各欄的數字格式（date 已是字串，不另外格式化）
+RECENT_FORMATS = {
+    "fx_twd_per_usd_mid": ",.2f",
+    "qqq_price_usd": ",.2f",
+    "twd_contribution": ",.2f",
+    "fx_oneway_spread": ".4f",
+    "commission_usd": ",.2f",
+    "usd_after_fx_and_fee": ",.2f",
+    "shares_bought": ".6f",
+    "total_shares": ".6f",
+    "portfolio_value_twd": ",.0f",
+}
+
 # 國泰成本（你可自行切換）
 COMMISSION_MODE = "etf_normal"  # "etf_normal"=3USD/筆, "dca"=0.1USD/筆
 FX_SPREAD_MODE = "digital"      # "digital"=0.10%, "spot"=0.19%
 # ===============================================
 
 
-def pick_trade_dates(price_index, start, end, mode="month_start"):
-    start_dt = pd.to_datetime(start)
-    end_dt = pd.to_datetime(end)
-    dates = price_index[(price_index >= start_dt) & (price_index <= end_dt)]
+def pick_trade_dates(price_index, start_ts: pd.Timestamp, end_ts: pd.Timestamp, mode="month_start"):
+    # 下面的換月判斷要求日期已排序；yfinance 與快取的資料本來就是排好的，這裡只是保險
+    if not price_index.is_monotonic_increasing:
+        price_index = price_index.sort_values()
+    # 直接取 slice（兩端皆包含），不必建整條布林遮罩
+    dates = price_index[price_index.slice_indexer(start_ts, end_ts)]
     if dates.empty:
         return dates
-    df = pd.DataFrame(index=dates)
-    df["y"] = df.index.year
-    df["m"] = df.index.month
+    # 月份序號（自 1970-01 起的月數，int64），相鄰不同即為換月
+    periods = dates.to_numpy().astype("datetime64[M]").astype(np.int64)
+    mask = np.empty(len(periods), dtype=bool)
     if mode == "month_start":
-        return df.groupby(["y", "m"]).head(1).index
+        mask[0] = True
+        mask[1:] = periods[1:] != periods[:-1]
     elif mode == "month_end":
-        return df.groupby(["y", "m"]).tail(1).index
+        mask[-1] = True
+        mask[:-1] = periods[:-1] != periods[1:]
     else:
         raise ValueError("mode must be month_start or month_end")
+    return dates[mask]
 
 
 def cathay_commission_usd(mode: str) -> float:
@@ -56,90 +88,214 @@ def cathay_fx_oneway_spread(mode: str) -> float:
     raise ValueError("FX_SPREAD_MODE must be 'digital' or 'spot'")
 
 
-def simulate(start, end, monthly_twd, trade_mode):
-    # 下載時往前多抓一段，避免遇到假日/資料空窗就整個空掉
-    dl_start = (pd.to_datetime(start) - pd.Timedelta(days=45)).date().isoformat()
-    dl_end = (pd.to_datetime(end) + pd.Timedelta(days=1)).date().isoformat()
-
-    qqq = yf.download("QQQ", start=dl_start, end=dl_end, auto_adjust=True, progress=False)
-    fx = yf.download("TWD=X", start=dl_start, end=dl_end, auto_adjust=True, progress=False)
-
-    # 回傳固定欄位，避免 df 空造成 plotly 爆炸
-    cols = [
-        "date", "fx_twd_per_usd_mid", "qqq_price_usd", "twd_contribution",
-        "fx_oneway_spread", "commission_usd", "usd_after_fx_and_fee",
-        "shares_bought", "total_shares", "portfolio_value_twd"
+def ticker_frame(data: pd.DataFrame, symbol: str) -> pd.DataFrame:
+    # group_by="ticker" 的結果取出單一標的；抓不到就回空表
+    if data.empty or not isinstance(data.columns, pd.MultiIndex):
+        return pd.DataFrame()
+    if symbol not in data.columns.get_level_values(0):
+        return pd.DataFrame()
+    return data[symbol]
+
+
+def download(symbols, start, end) -> pd.DataFrame:
+    # 用到才 import：快取命中時整個 yfinance 都不必載入
+    import yfinance as yf
+
+    # 一次請求抓全部標的，欄位為 (ticker, 欄位) 的 MultiIndex
+    return yf.download(
+        list(symbols), start=start, end=end,
+        auto_adjust=True, progress=False, group_by="ticker", threads=True,
+    )
+
+
+def adjustment_changed(cached: pd.DataFrame, fresh: pd.DataFrame) -> bool:
+    # auto_adjust 的價格在除息/分割後會整段改寫；重疊日的 Close 對不上就代表快取過期
+    # 快取最後一筆可能是盤中資料，不拿來比
+    if "Close" not in cached or "Close" not in fresh:
+        return True
+    overlap = cached.index[:-1].intersection(fresh.index)
+    if overlap.empty:
+        return True
+    return not np.allclose(cached.loc[overlap, "Close"], fresh.loc[overlap, "Close"], equal_nan=True)
+
+
+def load_or_fetch(symbols, start, end):
+    # 本機快取：cache/{symbol}_{start}.parquet，之後只補抓最後幾筆以後的資料
+    frames = {}
+    fetch_start = end
+    all_fresh = True
+    for sym in symbols:
+        path = CACHE_DIR / f"{sym}_{start}.parquet"
+        cached = pd.read_parquet(path) if path.exists() else pd.DataFrame()
+        frames[sym] = cached
+        all_fresh = all_fresh and not cached.empty and time.time() - path.stat().st_mtime < CACHE_TTL_SEC
+        # 往前重疊幾個交易日重抓：用來檢查還原價有沒有被改寫，最後一筆的盤中資料也順便覆蓋
+        if cached.empty:
+            sym_start = start
+        else:
+            sym_start = cached.index[max(len(cached) - CACHE_OVERLAP_ROWS, 0)].date().isoformat()
+        fetch_start = min(fetch_start, sym_start)
+
+    # 快取剛寫過（例如同一小時內重跑）就完全不連網
+    if all_fresh or fetch_start >= end:
+        return frames
+
+    data = download(symbols, fetch_start, end)
+    fresh = {sym: ticker_frame(data, sym).dropna(how="all") for sym in symbols}
+
+    stale = [
+        sym for sym in symbols
+        if not frames[sym].empty and not fresh[sym].empty and adjustment_changed(frames[sym], fresh[sym])
     ]
+    if stale:
+        # 除息/分割後舊的還原價都不能用了，丟掉快取整段重抓
+        full = download(stale, start, end)
+        for sym in stale:
+            refetched = ticker_frame(full, sym).dropna(how="all")
+            if refetched.empty:
+                # 重抓失敗就先沿用舊快取（不混入新還原價），也不覆寫 parquet，下次再重試
+                warnings.warn(f"{sym} 還原價已改寫但整段重抓失敗，暫用舊快取")
+                fresh[sym] = refetched
+                continue
+            frames[sym] = pd.DataFrame()
+            fresh[sym] = refetched
+
+    for sym in symbols:
+        if fresh[sym].empty:
+            continue
+        if frames[sym].empty:
+            merged = fresh[sym]
+        else:
+            merged = pd.concat([frames[sym], fresh[sym]])
+            merged = merged[~merged.index.duplicated(keep="last")].sort_index()
+        CACHE_DIR.mkdir(exist_ok=True)
+        merged.to_parquet(CACHE_DIR / f"{sym}_{start}.parquet")
+        frames[sym] = merged
+    return frames
+
+
+def empty_sim() -> dict:
+    # 回傳固定欄位，避免資料空造成 plotly 爆炸
+    return {c: np.array([], dtype=object if c == "date" else float) for c in SIM_COLS}
+
+
+def simulate(start, end, monthly_twd, trade_mode):
+    # 回傳 {欄位: ndarray}，要 DataFrame 時再由呼叫端建立
+    # 下載時往前多抓幾天，讓 START 當天若沒有匯率報價也能用前一筆補（長假也夠用）
+    start_ts = pd.Timestamp(start)
+    end_ts = pd.Timestamp(end)
+    dl_start = (start_ts - pd.Timedelta(days=7)).date().isoformat()
+    dl_end = (end_ts + pd.Timedelta(days=1)).date().isoformat()
+
+    frames = load_or_fetch(["QQQ", "TWD=X"], dl_start, dl_end)
+    qqq = frames["QQQ"]
+    fx = frames["TWD=X"]
 
     if qqq.empty or "Close" not in qqq:
-        return pd.DataFrame(columns=cols)
+        return empty_sim()
     if fx.empty or "Close" not in fx:
-        return pd.DataFrame(columns=cols)
+        return empty_sim()
 
     qqq_price = qqq["Close"].dropna()
-    fx_rate = fx["Close"].dropna().reindex(qqq_price.index).ffill()
+    fx_close = fx["Close"].dropna()
+    # 多檔下載時，某一檔失敗會是整欄 NaN 而不是空表
+    if qqq_price.empty or fx_close.empty:
+        return empty_sim()
 
-    # 只保留 START 以後
-    start_dt = pd.to_datetime(start)
-    qqq_price = qqq_price[qqq_price.index >= start_dt]
-    fx_rate = fx_rate.reindex(qqq_price.index).ffill()
+    # 只保留 START 以後；匯率對齊到 QQQ 交易日，缺的用前一筆（含 START 之前的）補
+    qqq_price = qqq_price[qqq_price.index >= start_ts]
+    fx_rate = fx_close.reindex(qqq_price.index, method="ffill")
 
     if qqq_price.empty or fx_rate.empty:
-        return pd.DataFrame(columns=cols)
+        return empty_sim()
 
-    trade_dates = pick_trade_dates(qqq_price.index, start, end, trade_mode)
+    trade_dates = pick_trade_dates(qqq_price.index, start_ts, end_ts, trade_mode)
     if trade_dates.empty:
-        return pd.DataFrame(columns=cols)
+        return empty_sim()
 
     commission = cathay_commission_usd(COMMISSION_MODE)
     fx_spread = cathay_fx_oneway_spread(FX_SPREAD_MODE)
 
-    total_shares = 0.0
-    rows = []
-
-    for d in trade_dates:
-        rate = float(fx_rate.loc[d])     # 單值
-        price = float(qqq_price.loc[d])  # 單值
+    rates = fx_rate.reindex(trade_dates).to_numpy(dtype=float).ravel()
+    prices = qqq_price.reindex(trade_dates).to_numpy(dtype=float).ravel()
 
-        if rate < 1:
-            return pd.DataFrame(columns=cols)
+    # TWD/USD 不可能小於 1，出現就是抓到反向報價（USD/TWD）
+    bad = rates < 1
+    if bad.any():
+        raise RuntimeError(f"匯率看起來反了 at {trade_dates[bad][0].date()}")
 
-        usd_gross = monthly_twd / rate
-        usd_net_fx = usd_gross * (1 - fx_spread)
-        usd_after_fee = max(usd_net_fx - commission, 0.0)
+    usd_after_fee = np.maximum(monthly_twd / rates * (1 - fx_spread) - commission, 0.0)
+    shares = usd_after_fee / prices
+    total_shares = np.cumsum(shares)
+    port_twd = total_shares * prices * rates
 
-        shares = usd_after_fee / price
-        total_shares += shares
+    n = len(rates)
+    return {
+        "date": trade_dates.strftime("%Y-%m-%d").to_numpy(),
+        "fx_twd_per_usd_mid": rates,
+        "qqq_price_usd": prices,
+        "twd_contribution": np.full(n, monthly_twd),
+        "fx_oneway_spread": np.full(n, fx_spread),
+        "commission_usd": np.full(n, commission),
+        "usd_after_fx_and_fee": usd_after_fee,
+        "shares_bought": shares,
+        "total_shares": total_shares,
+        "portfolio_value_twd": port_twd,
+    }
 
-        port_usd = total_shares * price
-        port_twd = port_usd * rate
 
-        rows.append({
-            "date": d.date().isoformat(),
-            "fx_twd_per_usd_mid": rate,
-            "qqq_price_usd": price,
-            "twd_contribution": monthly_twd,
-            "fx_oneway_spread": fx_spread,
-            "commission_usd": commission,
-            "usd_after_fx_and_fee": usd_after_fee,
-            "shares_bought": shares,
-            "total_shares": total_shares,
-            "portfolio_value_twd": port_twd,
-        })
-
-    return pd.DataFrame(rows, columns=cols)
+def plotly_go():
+    # 真的要畫圖才 import，plotly 載入很慢
+    import plotly.graph_objects as go
+    return go
 
 
 def fmt_int(n: float) -> str:
     return f"{n:,.0f}"
 
 
+def holding_row_html(p: dict, mv: float, cost: float, pp: float, pp_pct: float) -> str:
+    pp_class = "pos" if pp >= 0 else "neg"
+    pp_sign = "+" if pp >= 0 else "-"
+    return f"""
+        <tr>
+          <td><b>{p.get("symbol","")}</b><br><span class="muted">{p.get("name","")}</span></td>
+          <td style="text-align:right;">{p.get("shares","")}</td>
+          <td style="text-align:right;">{p.get("avg_cost_usd","")}</td>
+          <td style="text-align:right;">{fmt_int(cost)}</td>
+          <td style="text-align:right;">{fmt_int(mv)}</td>
+          <td style="text-align:right;" class="{pp_class}">{pp_sign}{fmt_int(abs(pp))}<br>{pp_sign}{abs(pp_pct)*100:.2f}%</td>
+        </tr>
+        """
+
+
+@functools.lru_cache(maxsize=1)
+def read_snapshot(path: str, mtime: float) -> dict:
+    # 以 (路徑, 修改時間) 當快取鍵，檔案改了就會重新讀
+    raw = Path(path).read_bytes()
+    return orjson.loads(raw) if orjson else json.loads(raw)
+
+
+def recent_table_html(sim: dict, n: int) -> str:
+    # 欄位固定，直接組 HTML，不經過 pandas 的 to_html
+    specs = [RECENT_FORMATS.get(c, "") for c in SIM_COLS]
+    head = "".join(f"<th>{c}</th>" for c in SIM_COLS)
+    body = "".join(
+        "<tr>" + "".join(f"<td>{v:{spec}}</td>" for v, spec in zip(row, specs)) + "</tr>"
+        for row in zip(*(sim[c][-n:] for c in SIM_COLS))
+    )
+    return f"""<table border="1" class="dataframe">
+  <thead><tr style="text-align: right;">{head}</tr></thead>
+  <tbody>{body}</tbody>
+</table>"""
+
+
 def build_cathay_style_snapshot():
     snap_path = Path("actual_snapshot.json")
     if not snap_path.exists():
         return ("<h2>實際持倉</h2><p style='color:#b00;'>找不到 actual_snapshot.json（請放 repo 根目錄）</p>", "")
 
-    snap = json.loads(snap_path.read_text(encoding="utf-8"))
+    snap = read_snapshot(str(snap_path), snap_path.stat().st_mtime)
     as_of = snap.get("as_of", "")
     broker = snap.get("broker", "")
     currency = snap.get("currency", "TWD")
@@ -148,8 +304,10 @@ def build_cathay_style_snapshot():
     if not isinstance(positions, list) or len(positions) == 0:
         return ("<h2>實際持倉</h2><p style='color:#b00;'>positions 格式錯誤</p>", "")
 
-    total_mv = float(sum(p.get("market_value_twd", 0) for p in positions))
-    total_cost = float(sum(p.get("total_cost_twd", 0) for p in positions))
+    mv = np.fromiter((float(p.get("market_value_twd", 0)) for p in positions), dtype=float, count=len(positions))
+    cost = np.fromiter((float(p.get("total_cost_twd", 0)) for p in positions), dtype=float, count=len(positions))
+    total_mv = float(mv.sum())
+    total_cost = float(cost.sum())
     pnl = total_mv - total_cost
     pnl_pct = (pnl / total_cost) if total_cost > 0 else 0.0
 
@@ -179,25 +337,13 @@ def build_cathay_style_snapshot():
     """
 
     # 明細表
-    rows_html = ""
-    for p in positions:
-        mv = float(p.get("market_value_twd", 0))
-        cost = float(p.get("total_cost_twd", 0))
-        pp = mv - cost
-        pp_pct = (pp / cost) if cost > 0 else 0.0
-        pp_class = "pos" if pp >= 0 else "neg"
-        pp_sign = "+" if pp >= 0 else "-"
-
-        rows_html += f"""
-        <tr>
-          <td><b>{p.get("symbol","")}</b><br><span class="muted">{p.get("name","")}</span></td>
-          <td style="text-align:right;">{p.get("shares","")}</td>
-          <td style="text-align:right;">{p.get("avg_cost_usd","")}</td>
-          <td style="text-align:right;">{fmt_int(cost)}</td>
-          <td style="text-align:right;">{fmt_int(mv)}</td>
-          <td style="text-align:right;" class="{pp_class}">{pp_sign}{fmt_int(abs(pp))}<br>{pp_sign}{abs(pp_pct)*100:.2f}%</td>
-        </tr>
-        """
+    pp = mv - cost
+    pp_pct = np.divide(pp, cost, out=np.zeros_like(pp), where=cost > 0)
+
+    rows_html = "".join(
+        holding_row_html(p, p_mv, p_cost, p_pp, p_pct)
+        for p, p_mv, p_cost, p_pp, p_pct in zip(positions, mv, cost, pp, pp_pct)
+    )
 
     holdings_html = f"""
     <h2>持倉明細</h2>
@@ -219,17 +365,24 @@ def build_cathay_style_snapshot():
     """
 
     # 分配圖
-    alloc_df = pd.DataFrame([{"symbol": p.get("symbol",""), "value": float(p.get("market_value_twd", 0))} for p in positions])
     alloc_plot_html = ""
-    if alloc_df["value"].sum() > 0:
-        fig_alloc = px.pie(alloc_df, names="symbol", values="value", title="資產分配（依現值 TWD）", hole=0.55)
-        fig_alloc.update_traces(textposition="inside", textinfo="percent+label")
-        alloc_plot_html = fig_alloc.to_html(full_html=False, include_plotlyjs="cdn")
+    if total_mv > 0:
+        go = plotly_go()
+        fig_alloc = go.Figure(go.Pie(
+            labels=[p.get("symbol","") for p in positions], values=mv, hole=0.55,
+            textposition="inside", textinfo="percent+label",
+        ))
+        fig_alloc.update_layout(title="資產分配（依現值 TWD）")
+        # 分配圖在頁面上排在前面，由它載入 plotly.js；資產曲線就不必再載一次
+        alloc_plot_html = fig_alloc.to_html(full_html=False, include_plotlyjs="cdn", div_id="alloc-pie")
 
     return (card_html + holdings_html, alloc_plot_html)
 
 
-def build_report(df: pd.DataFrame):
+def build_report(sim: dict):
+    commission = cathay_commission_usd(COMMISSION_MODE)
+    fx_spread = cathay_fx_oneway_spread(FX_SPREAD_MODE)
+
     css = """
     <style>
       body { font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif; padding:16px; }
@@ -254,8 +407,10 @@ def build_report(df: pd.DataFrame):
 
     snapshot_html, alloc_plot_html = build_cathay_style_snapshot()
 
-    # 模擬區塊：如果 df 空，就顯示提示，不畫圖（避免你現在那個 plotly error）
-    if df.empty:
+    months = len(sim["date"])
+
+    # 模擬區塊：如果沒資料，就顯示提示，不畫圖（避免你現在那個 plotly error）
+    if months == 0:
         sim_block = f"""
         <h2>資產曲線（模擬）</h2>
         <div class="card">
@@ -270,20 +425,22 @@ def build_report(df: pd.DataFrame):
           <ul>
             <li>起始日：{START}</li>
             <li>每月投入：{fmt_int(MONTHLY_TWD)} TWD</li>
-            <li>手續費模式：{COMMISSION_MODE}（每筆 {cathay_commission_usd(COMMISSION_MODE):.2f} USD）</li>
-            <li>匯差模式：{FX_SPREAD_MODE}（單邊 {cathay_fx_oneway_spread(FX_SPREAD_MODE)*100:.2f}%）</li>
+            <li>手續費模式：{COMMISSION_MODE}（每筆 {commission:.2f} USD）</li>
+            <li>匯差模式：{FX_SPREAD_MODE}（單邊 {fx_spread*100:.2f}%）</li>
           </ul>
         </div>
         """
     else:
-        months = len(df)
         total_in = MONTHLY_TWD * months
-        final_value = float(df["portfolio_value_twd"].iloc[-1])
+        final_value = float(sim["portfolio_value_twd"][-1])
         profit = final_value - total_in
         roi = (profit / total_in) if total_in > 0 else 0.0
 
-        fig_curve = px.line(df, x="date", y="portfolio_value_twd", title=f"QQQ 模擬資產曲線（從 {START} 起）")
-        fig_curve.update_layout(xaxis_title="日期", yaxis_title="資產（TWD）")
+        go = plotly_go()
+        fig_curve = go.Figure(go.Scatter(
+            x=sim["date"], y=sim["portfolio_value_twd"], mode="lines", name="TWD",
+        ))
+        fig_curve.update_layout(title=f"QQQ 模擬資產曲線（從 {START} 起）", xaxis_title="日期", yaxis_title="資產（TWD）")
 
         summary_block = f"""
         <h2>模擬摘要（不是你的實際帳戶）</h2>
@@ -305,8 +462,8 @@ def build_report(df: pd.DataFrame):
             <li>起始日：{START}</li>
             <li>買入規則：月初（每月第一個交易日）</li>
             <li>每月投入：{fmt_int(MONTHLY_TWD)} TWD</li>
-            <li>手續費模式：{COMMISSION_MODE}（每筆 {cathay_commission_usd(COMMISSION_MODE):.2f} USD）</li>
-            <li>匯差模式：{FX_SPREAD_MODE}（單邊 {cathay_fx_oneway_spread(FX_SPREAD_MODE)*100:.2f}%）</li>
+            <li>手續費模式：{COMMISSION_MODE}（每筆 {commission:.2f} USD）</li>
+            <li>匯差模式：{FX_SPREAD_MODE}（單邊 {fx_spread*100:.2f}%）</li>
             <li>匯率資料：Yahoo Finance 的 TWD=X（近似中間價）</li>
           </ul>
         </div>
@@ -315,42 +472,51 @@ def build_report(df: pd.DataFrame):
         sim_block = f"""
         <h2>資產曲線（模擬）</h2>
         <div class="card">
-          {fig_curve.to_html(full_html=False, include_plotlyjs="cdn")}
+          {fig_curve.to_html(full_html=False, include_plotlyjs=False if alloc_plot_html else "cdn", div_id="qqq-curve")}
         </div>
         """
 
-        table_html = df.tail(24).to_html(index=False)
+        table_html = recent_table_html(sim, 24)
         recent_block = f"""
         <h2>最近 24 筆（模擬）</h2>
         <div class="card">{table_html}</div>
         """
 
-    html = f"""
+    header = f"""
     <html><head><meta charset="utf-8"><title>QQQ 報告</title>{css}</head>
     <body>
       <h1>QQQ 報告</h1>
-
-      {snapshot_html}
-
+    """
+    alloc_block = f"""
       <h2>資產分配</h2>
       <div class="card">
         {alloc_plot_html if alloc_plot_html else "<p class='muted'>目前只有單一標的或現值為 0，分配圖不顯示。</p>"}
       </div>
-
-      {summary_block}
-      {params_block}
-      {sim_block}
-      {recent_block}
-
+    """
+    footer = f"""
       <p class="muted">更新時間：{dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S")}</p>
     </body></html>
     """
 
-    (OUT_DIR / "index.html").write_text(html, encoding="utf-8")
-    # df 可能空，但也寫出 csv（方便你 debug）
+    # 各區塊依序寫出，不先組成一整頁的大字串
+    blocks = (header, snapshot_html, alloc_block, summary_block, params_block, sim_block, recent_block, footer)
+    with (OUT_DIR / "index.html").open("w", encoding="utf-8") as f:
+        f.writelines(blocks)
+
+    if months == 0:
+        # 沒資料時只寫欄位列（方便你 debug），不必動用 pandas；舊的 parquet 也移除，避免跟 csv 不一致
+        (OUT_DIR / "data.csv").write_text(",".join(SIM_COLS) + "\n", encoding="utf-8-sig")
+        (OUT_DIR / "data.parquet").unlink(missing_ok=True)
+        return
+
+    df = pd.DataFrame(sim, columns=SIM_COLS)
     df.to_csv(OUT_DIR / "data.csv", index=False, encoding="utf-8-sig")
+    # 欄式格式，資料量變大時讀寫都比 csv 快
+    df.to_parquet(OUT_DIR / "data.parquet", index=False)
 
 
 if __name__ == "__main__":
-    df = simulate(START, END, MONTHLY_TWD, TRADE_MODE)
-    build_report(df)
\ No newline at end of file
+    # yfinance 的 end 是「不包含」當天，所以用「明天」避免抓不到今天/最近交易日
+    end = (dt.date.today() + dt.timedelta(days=1)).isoformat()
+    sim = simulate(START, end, MONTHLY_TWD, TRADE_MODE)
+    build_report(sim)
\ No newline at end of file